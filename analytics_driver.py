@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Incremental analytics over result history.
+
+A processed-set manifest remembers (run, prompt_id) -> response hash for every
+record already analysed. Each invocation only pushes records it has not seen
+through the analysis stages (postprocess_results stats and list_rankings rank
+buckets). Their outputs are mergeable counters, kept per run and summed into
+the stored totals, so a daily run costs as much as that day's results rather
+than all of history.
+
+If a run's existing record comes back with a different response hash (a
+re-scraped or edited run), that run's partial aggregate is rebuilt from its
+file and replaces the old one; counters can't be un-merged record by record.
+Results marked carried_over (see corpus_diff.py) are skipped.
+
+Env:
+    RESULTS_FILES     comma-separated results files; "run_id=path" names the
+                      run, otherwise RUN_ID (single file) or the file name is used
+    RUN_ID            run id for a single unnamed file
+    QUERIES_FILE      prompt corpus (default merlinAi.json)
+    ANALYTICS_STATE   state directory (default analytics_state)
+    OUT_FILE          finalized report (default analytics_report.json)
+    WORKERS           processes for the stats stage (default os.cpu_count())
+"""
+
+import json
+import os
+from collections import Counter
+
+from list_rankings import finalize_bucket, merge_buckets, new_bucket, rank_results, warn_no_html
+from postprocess_results import finalize_stats, init_worker, merge_stats, process_chunk, run_pipeline
+from scrape_utils import compile_brand_pattern, env_int, iter_json_array, load_json, load_query_index, text_signature
+
+# ====================== State ======================
+
+def load_state(state_dir):
+    path = os.path.join(state_dir, "processed.json")
+    processed = load_json(path) if os.path.exists(path) else {}
+    path = os.path.join(state_dir, "aggregates.json")
+    aggregates = load_json(path) if os.path.exists(path) else {}
+    runs = {run: {"stats": _counters(a["stats"]), "rankings": a["rankings"]} for run, a in aggregates.get("runs", {}).items()}
+    return processed, runs
+
+def save_state(state_dir, processed, runs):
+    os.makedirs(state_dir, exist_ok=True)
+    for name, payload in (("processed.json", processed), ("aggregates.json", {"runs": runs})):
+        path = os.path.join(state_dir, name)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(payload, f, ensure_ascii=False)
+        os.replace(path + ".tmp", path)
+
+def _counters(stats):
+    # JSON turns Counters into dicts; merge_stats needs Counters to add up
+    return {k: Counter(v) if isinstance(v, dict) else v for k, v in stats.items()}
+
+def record_key(r):
+    pid = r.get("prompt_id")
+    return str(pid if pid is not None else r.get("query_index"))
+
+def record_hash(r):
+    return text_signature(r.get("response", ""))
+
+def parse_sources(raw, default_run=""):
+    sources = []
+    entries = [p.strip() for p in raw.split(",") if p.strip()]
+    for entry in entries:
+        run, sep, path = entry.partition("=")
+        if not sep:
+            path = entry
+            run = default_run if default_run and len(entries) == 1 else os.path.splitext(os.path.basename(path))[0]
+        sources.append((run, path))
+    return sources
+
+# ====================== Stages ======================
+
+def analyse(records, query_index, brand_pattern, workers, queries_file):
+    """
+    Run the analysis stages over records; returns mergeable partials.
+    Each processed chunk is ranked as it comes out of the pipeline, so only
+    the chunks in flight are held in memory.
+    """
+    stats = {}
+    rankings = {}
+    pattern, groups = brand_pattern
+    for out, part in run_pipeline(records, process_chunk, workers=workers,
+                                  initializer=init_worker, initargs=(queries_file,)):
+        merge_stats(stats, part)
+        rank_results(out, query_index, pattern, groups, rankings)
+    return {"stats": stats, "rankings": rankings}
+
+def merge_partial(total, part):
+    merge_stats(total["stats"], part["stats"])
+    for qtype, bucket in part["rankings"].items():
+        merge_buckets(total["rankings"].setdefault(qtype, new_bucket()), bucket)
+    return total
+
+def update_run(run, path, processed, runs, query_index, brand_pattern, workers, queries_file):
+    """
+    Analyse the unseen records of one run file. Returns how many records
+    went through the stages.
+    """
+    seen = processed.get(run, {})
+    # Carried-over results were already analysed under the run that produced them
+    records = [r for r in iter_json_array(path) if not r.get("carried_over")]
+    hashes = {record_key(r): record_hash(r) for r in records}
+
+    changed = [k for k, h in seen.items() if k in hashes and hashes[k] != h]
+    if changed or run not in runs:
+        todo = records
+        if changed:
+            print(f"[ANALYTICS] {run}: {len(changed)} changed records -> rebuilding run aggregate")
+        runs[run] = {"stats": {}, "rankings": {}}
+    else:
+        todo = [r for r in records if record_key(r) not in seen]
+
+    if todo:
+        merge_partial(runs[run], analyse(todo, query_index, brand_pattern, workers, queries_file))
+    processed[run] = dict(seen, **hashes) if not changed else hashes
+    print(f"[ANALYTICS] {run}: {len(todo)}/{len(records)} records analysed")
+    return len(todo)
+
+def totals(runs):
+    total = {"stats": {}, "rankings": {}}
+    for part in runs.values():
+        merge_partial(total, part)
+    overall = new_bucket()
+    for bucket in total["rankings"].values():
+        merge_buckets(overall, bucket)
+    return {
+        "runs": sorted(runs),
+        "stats": finalize_stats(total["stats"]),
+        "rankings": {
+            "overall": finalize_bucket(overall),
+            "by_type": {t: finalize_bucket(b) for t, b in sorted(total["rankings"].items())},
+        },
+    }
+
+# ====================== Entry ======================
+
+def main():
+    sources = parse_sources(os.environ.get("RESULTS_FILES", "combined_results.json"), os.environ.get("RUN_ID", "").strip())
+    queries_file = os.environ.get("QUERIES_FILE", "merlinAi.json")
+    state_dir = os.environ.get("ANALYTICS_STATE", "analytics_state")
+    out_file = os.environ.get("OUT_FILE", "analytics_report.json")
+    workers = env_int("WORKERS", os.cpu_count() or 1)
+
+    processed, runs = load_state(state_dir)
+    query_index = load_query_index(queries_file)
+    brand_pattern = compile_brand_pattern()
+
+    analysed = 0
+    for run, path in sources:
+        if not os.path.exists(path):
+            print(f"[WARN] Results file not found: {path}")
+            continue
+        analysed += update_run(run, path, processed, runs, query_index, brand_pattern, workers, queries_file)
+
+    save_state(state_dir, processed, runs)
+    report = totals(runs)
+    warn_no_html(report["rankings"]["overall"])
+    with open(out_file, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+
+    print(f"[✓] {analysed} new/changed records analysed; totals over {len(runs)} runs saved to {out_file}")
+    return report
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Near-duplicate and grammar-variant audit of the prompt corpus.
+
+Prompts are sanitized, lightly stemmed (so "reduce reducing delays" and
+"reduce delays" compare equal), stripped of filler words (articles, I/we/you,
+do/does) and shingled into word n-grams. MinHash signatures are computed with
+NumPy over all prompts at once and bucketed with LSH banding to find
+candidate pairs.
+
+The corpus is generated from a handful of templates, so two prompts that only
+differ in their slot ("...gain from speed?" / "...gain from cost?") share most
+of their shingles. Candidates are therefore confirmed on the Jaccard of their
+content-word sets, and the default threshold of 1.0 means any differing
+content word keeps two prompts apart. Confirmed pairs are joined into
+clusters; each cluster gets a canonical prompt (the first member without a
+template grammar artifact).
+
+Modes (AUDIT_MODE):
+    audit   (default) write the report, and the deduplicated corpus if
+            DEDUP_FILE is set. The deduplicated corpus has the same layout as
+            merlinAi.json plus a "canonical_map" of every original id to its
+            canonical id, so it can be fed to the scraper via QUERIES_FILE.
+    fanout  copy results for canonical prompts back onto their duplicates.
+    check   audit the corpus plus the pairs in AUDIT_CASES and exit non-zero
+            if a pair is matched or split against its expectation, or a
+            grammar case is flagged wrongly.
+
+Env:
+    QUERIES_FILE       prompt corpus (default merlinAi.json)
+    OUT_FILE           audit report (default prompt_audit.json)
+    DEDUP_FILE         deduplicated corpus to write/read (default empty in audit
+                       mode, merlinAi.dedup.json in fanout mode)
+    RESULTS_FILE       fanout input (default combined_results.json)
+    FANOUT_FILE        fanout output (default combined_results.fanout.json)
+    AUDIT_CASES        check cases (default benchmarks/fixtures/audit_cases.json)
+    DUP_THRESHOLD      content-word Jaccard to call two prompts duplicates (default
+                       1.0; lower values also merge prompts whose slots differ)
+    SHINGLE_SIZE       words per shingle (default 2)
+    MINHASH_PERMS      signature length (default 128)
+    LSH_BANDS          bands; MINHASH_PERMS must divide evenly (default 32)
+"""
+
+import json
+import os
+import re
+import sys
+import zlib
+from collections import defaultdict
+
+import numpy as np
+
+from scrape_utils import env_float, env_int, load_json, sanitize_prompt
+
+WORD_RE = re.compile(r"[a-z0-9%]+")
+HASH_PRIME = 4294967291  # largest 32-bit prime; keeps a*h + b inside uint64
+FILLER_WORDS = {"a", "an", "the", "i", "we", "you", "my", "our", "your", "me", "us", "do", "does", "did"}
+
+# Template artifacts such as "how can I reducing", "should we automating", "reduce reducing".
+# Only a modal + I/we + gerund is flagged; "how does scheduling software help?" is fine.
+GRAMMAR_CHECKS = [
+    ("modal_gerund", re.compile(r"\b(?:can|could|should|would|will|shall|may|might|must|do)\s+(?:i|we)\s+"
+                                r"(?!(?:bring|thing|string|spring|swing|sing|ring|king)\b)\w{3,}ing\b", re.I)),
+    ("repeated_stem", re.compile(r"\b(\w{4,}?)\w*\s+\1\w*\b", re.I)),
+]
+
+# ====================== Normalization ======================
+
+def stem(word):
+    """
+    Crude suffix stripping, enough to fold "reduce/reduces/reducing" and
+    "cut/cutting" together.
+    """
+    for suffix in ("ing", "ed", "es", "s"):
+        if len(word) > len(suffix) + 3 and word.endswith(suffix):
+            word = word[: -len(suffix)]
+            if suffix in ("ing", "ed") and word[-1] == word[-2] and word[-1] not in "lsz":
+                word = word[:-1]
+            break
+    if len(word) > 4 and word.endswith("e"):
+        word = word[:-1]
+    return word
+
+def normalize_prompt(text):
+    """
+    Tokens for comparison: sanitized, lowercased, filler words dropped,
+    stemmed, with consecutive repeats of the same stem collapsed.
+    """
+    out = []
+    for w in WORD_RE.findall(sanitize_prompt(text).lower()):
+        if w in FILLER_WORDS:
+            continue
+        s = stem(w)
+        if not out or out[-1] != s:
+            out.append(s)
+    return out
+
+def shingles(tokens, k=2):
+    if len(tokens) <= k:
+        return {" ".join(tokens)} if tokens else set()
+    return {" ".join(tokens[i:i + k]) for i in range(len(tokens) - k + 1)}
+
+def grammar_issues(text):
+    s = sanitize_prompt(text)
+    return [name for name, rx in GRAMMAR_CHECKS if rx.search(s)]
+
+# ====================== MinHash / LSH ======================
+
+def minhash_signatures(shingle_sets, num_perm=128, seed=1):
+    """
+    (n, num_perm) uint64 MinHash signatures. Shingles are crc32-hashed once;
+    all permutations (a*x + b mod p) are applied as one broadcast per prompt.
+    """
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, HASH_PRIME, size=num_perm, dtype=np.uint64)
+    b = rng.integers(0, HASH_PRIME, size=num_perm, dtype=np.uint64)
+    sigs = np.full((len(shingle_sets), num_perm), np.iinfo(np.uint64).max, dtype=np.uint64)
+    for i, sh in enumerate(shingle_sets):
+        if not sh:
+            continue
+        h = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in sh), dtype=np.uint64, count=len(sh))
+        sigs[i] = ((h[:, None] * a[None, :] + b[None, :]) % HASH_PRIME).min(axis=0)
+    return sigs
+
+def lsh_candidates(sigs, bands=32):
+    n, num_perm = sigs.shape
+    if num_perm % bands:
+        raise ValueError(f"MINHASH_PERMS ({num_perm}) must be divisible by LSH_BANDS ({bands})")
+    rows = num_perm // bands
+    pairs = set()
+    for band in range(bands):
+        buckets = defaultdict(list)
+        block = np.ascontiguousarray(sigs[:, band * rows:(band + 1) * rows])
+        for i in range(n):
+            buckets[block[i].tobytes()].append(i)
+        for members in buckets.values():
+            if len(members) > 1:
+                for x in range(len(members)):
+                    for y in range(x + 1, len(members)):
+                        pairs.add((members[x], members[y]))
+    return pairs
+
+def jaccard(a, b):
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+def cluster_pairs(n, pairs):
+    parent = list(range(n))
+
+    def find(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for x, y in pairs:
+        rx, ry = find(x), find(y)
+        if rx != ry:
+            parent[max(rx, ry)] = min(rx, ry)
+
+    groups = defaultdict(list)
+    for i in range(n):
+        groups[find(i)].append(i)
+    return [g for g in groups.values() if len(g) > 1]
+
+# ====================== Audit ======================
+
+def audit_corpus(queries, threshold=1.0, shingle_size=2, num_perm=128, bands=32):
+    tokens = [normalize_prompt(q.get("text", "")) for q in queries]
+    sets = [shingles(t, shingle_size) for t in tokens]
+    words = [set(t) for t in tokens]
+    sigs = minhash_signatures(sets, num_perm=num_perm)
+    candidates = lsh_candidates(sigs, bands=bands)
+    # Shingle overlap only nominates pairs; the words that differ decide
+    pairs = [(x, y) for x, y in candidates if jaccard(words[x], words[y]) >= threshold]
+    issues = {i: grammar_issues(q.get("text", "")) for i, q in enumerate(queries)}
+
+    clusters = []
+    canonical_map = {}
+    for members in cluster_pairs(len(queries), pairs):
+        members.sort()
+        clean = [i for i in members if not issues[i]]
+        canon = clean[0] if clean else members[0]
+        clusters.append({
+            "canonical_id": queries[canon].get("id"),
+            "canonical_text": sanitize_prompt(queries[canon].get("text", "")),
+            "size": len(members),
+            "members": [
+                {
+                    "id": queries[i].get("id"),
+                    "text": sanitize_prompt(queries[i].get("text", "")),
+                    "jaccard": round(jaccard(words[canon], words[i]), 3),
+                }
+                for i in members
+            ],
+        })
+        for i in members:
+            canonical_map[queries[i].get("id")] = queries[canon].get("id")
+    clusters.sort(key=lambda c: -c["size"])
+
+    for q in queries:
+        canonical_map.setdefault(q.get("id"), q.get("id"))
+
+    grammar = [
+        {"id": queries[i].get("id"), "text": sanitize_prompt(queries[i].get("text", "")), "issues": found}
+        for i, found in issues.items() if found
+    ]
+    return {
+        "prompts": len(queries),
+        "candidate_pairs": len(candidates),
+        "duplicate_pairs": len(pairs),
+        "clusters": clusters,
+        "redundant_prompts": sum(c["size"] - 1 for c in clusters),
+        "grammar_issues": grammar,
+    }, canonical_map
+
+def dedup_corpus(data, canonical_map):
+    queries = [q for q in data.get("queries", []) if canonical_map.get(q.get("id")) == q.get("id")]
+    metadata = dict(data.get("metadata", {}), total_queries=len(queries), deduplicated_from=len(data.get("queries", [])))
+    return {"metadata": metadata, "queries": queries, "canonical_map": canonical_map}
+
+# ====================== Fan-out ======================
+
+def fan_out_results(results, dedup):
+    """
+    Results keyed by canonical prompt_id, copied onto every duplicate id in
+    dedup["canonical_map"]. Copies carry canonical_prompt_id for traceability.
+    """
+    by_id = {r.get("prompt_id"): r for r in results}
+    out = []
+    for qid, canon in dedup.get("canonical_map", {}).items():
+        r = by_id.get(canon)
+        if r is None:
+            continue
+        if qid == canon:
+            out.append(r)
+        else:
+            out.append(dict(r, prompt_id=qid, canonical_prompt_id=canon))
+    return out
+
+# ====================== Check ======================
+
+def check_cases(queries, cases, **params):
+    """
+    Run the audit over the corpus plus every case pair and compare with the
+    expected outcome. Returns a list of failure descriptions.
+    """
+    pairs = cases.get("pairs", [])
+    extra = []
+    for n, case in enumerate(pairs):
+        extra.append({"id": f"case_{n}_a", "text": case["a"]})
+        extra.append({"id": f"case_{n}_b", "text": case["b"]})
+    _, canonical_map = audit_corpus(list(queries) + extra, **params)
+
+    failures = []
+    for n, case in enumerate(pairs):
+        matched = canonical_map[f"case_{n}_a"] == canonical_map[f"case_{n}_b"]
+        if matched != case["duplicate"]:
+            failures.append(f"{'split' if case['duplicate'] else 'matched'}: {case['a']!r} / {case['b']!r}")
+    for case in cases.get("grammar", []):
+        found = grammar_issues(case["text"])
+        if found != case["issues"]:
+            failures.append(f"grammar {found} != {case['issues']}: {case['text']!r}")
+    return failures
+
+# ====================== Entry ======================
+
+def main():
+    mode = os.environ.get("AUDIT_MODE", "audit").strip().lower()
+    queries_file = os.environ.get("QUERIES_FILE", "merlinAi.json")
+
+    if mode == "fanout":
+        dedup_file = os.environ.get("DEDUP_FILE", "merlinAi.dedup.json")
+        results_file = os.environ.get("RESULTS_FILE", "combined_results.json")
+        fanout_file = os.environ.get("FANOUT_FILE", "combined_results.fanout.json")
+        results = fan_out_results(load_json(results_file), load_json(dedup_file))
+        with open(fanout_file, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+        print(f"[✓] Fanned out to {len(results)} results, saved to {fanout_file}")
+        return results
+
+    params = {
+        "threshold": env_float("DUP_THRESHOLD", 1.0),
+        "shingle_size": env_int("SHINGLE_SIZE", 2),
+        "num_perm": env_int("MINHASH_PERMS", 128),
+        "bands": env_int("LSH_BANDS", 32),
+    }
+    data = load_json(queries_file)
+
+    if mode == "check":
+        cases_file = os.environ.get("AUDIT_CASES", os.path.join("benchmarks", "fixtures", "audit_cases.json"))
+        cases = load_json(cases_file)
+        failures = check_cases(data.get("queries", []), cases, **params)
+        total = len(cases.get("pairs", [])) + len(cases.get("grammar", []))
+        print(f"[CHECK] {total - len(failures)}/{total} passed")
+        for f in failures:
+            print(f"[CHECK][FAIL] {f}")
+        if failures:
+            sys.exit(1)
+        return failures
+
+    out_file = os.environ.get("OUT_FILE", "prompt_audit.json")
+    dedup_file = os.environ.get("DEDUP_FILE", "").strip()
+
+    report, canonical_map = audit_corpus(data.get("queries", []), **params)
+    with open(out_file, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+
+    print(f"[AUDIT] {report['prompts']} prompts, {len(report['clusters'])} duplicate clusters, "
+          f"{report['redundant_prompts']} redundant prompts")
+    print(f"[AUDIT] {len(report['grammar_issues'])} prompts with template grammar artifacts")
+    print(f"[✓] Report saved to {out_file}")
+
+    if dedup_file:
+        dedup = dedup_corpus(data, canonical_map)
+        with open(dedup_file, "w", encoding="utf-8") as f:
+            json.dump(dedup, f, indent=2, ensure_ascii=False)
+        print(f"[✓] Deduplicated corpus ({len(dedup['queries'])} prompts) saved to {dedup_file}")
+    return report
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Offline golden-corpus check and benchmark for the extraction path.
+
+No browser or network needed. Each benchmarks/fixtures/<name>.html is a saved
+conversation page; the latest assistant message is picked with the scraper's
+RESPONSE_SELECTORS and extracted with extract_response_text, and the result
+must equal <name>.expected.txt. sanitize_cases.json pins sanitize_prompt.
+
+Then extraction, sanitization (over the whole prompt corpus) and result
+serialization are timed with timeit and their tracemalloc peaks recorded. The
+report is JSON; with BENCH_BASELINE set, every stage is compared against that
+report and slowdowns or memory growth beyond BENCH_TOLERANCE are flagged.
+Exits non-zero on golden mismatches or regressions.
+
+To record a baseline:  BENCH_OUT=benchmarks/baseline.json python bench_extraction.py
+
+Env:
+    FIXTURES_DIR      fixture folder (default benchmarks/fixtures)
+    QUERIES_FILE      prompt corpus for sanitize timing (default merlinAi.json)
+    BENCH_OUT         report path (default bench_report.json)
+    BENCH_BASELINE    previous report to compare against (optional)
+    BENCH_TOLERANCE   allowed relative slowdown / memory growth (default 0.25)
+    BENCH_REPEAT      timeit repeats, best one is kept (default 5)
+"""
+
+import glob
+import io
+import json
+import os
+import platform
+import sys
+import timeit
+import tracemalloc
+
+from scrape_utils import (
+    env_float,
+    env_int,
+    extract_response_text,
+    load_json,
+    sanitize_prompt,
+    select_latest_response,
+)
+
+# ====================== Golden Corpus ======================
+
+def load_fixtures(fixtures_dir):
+    fixtures = []
+    for path in sorted(glob.glob(os.path.join(fixtures_dir, "*.html"))):
+        name = os.path.splitext(os.path.basename(path))[0]
+        with open(path, "r", encoding="utf-8") as f:
+            page = f.read()
+        expected_path = os.path.join(fixtures_dir, f"{name}.expected.txt")
+        expected = None
+        if os.path.exists(expected_path):
+            with open(expected_path, "r", encoding="utf-8") as f:
+                expected = f.read().rstrip("\n")
+        fixtures.append({"name": name, "page": page, "expected": expected})
+    return fixtures
+
+def check_golden(fixtures, sanitize_cases):
+    failures = []
+    for fx in fixtures:
+        html = select_latest_response(fx["page"])
+        got = extract_response_text(html) if html is not None else None
+        if fx["expected"] is None:
+            failures.append({"fixture": fx["name"], "error": "missing .expected.txt"})
+        elif got != fx["expected"]:
+            failures.append({"fixture": fx["name"], "expected": fx["expected"], "got": got})
+    for case in sanitize_cases:
+        got = sanitize_prompt(case["input"])
+        if got != case["expected"]:
+            failures.append({"sanitize": case["input"], "expected": case["expected"], "got": got})
+    return {"checked": len(fixtures) + len(sanitize_cases), "failed": failures}
+
+# ====================== Benchmarks ======================
+
+def measure(fn, items, repeat=5):
+    """
+    Best-of-repeat time per item (one call of fn over all items per run) and
+    the tracemalloc peak of a single run.
+    """
+    timer = timeit.Timer(lambda: fn())
+    number, _ = timer.autorange()
+    best = min(timer.repeat(repeat=repeat, number=number)) / number
+
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    per_item = best / max(1, items)
+    return {
+        "items": items,
+        "per_item_us": round(per_item * 1e6, 3),
+        "items_per_sec": round(1.0 / per_item, 1) if per_item else None,
+        "peak_kb": round(peak / 1024, 1),
+    }
+
+def sample_results(fixtures, prompts, n=1000):
+    texts = [fx["expected"] or "" for fx in fixtures] or [""]
+    return [
+        {
+            "prompt": prompts[i % len(prompts)] if prompts else "",
+            "response": texts[i % len(texts)],
+            "screenshot": f"screenshots/success_{i + 1}_1700000000.png",
+            "captcha_type": None,
+            "batch_id": 1,
+            "query_index": i,
+            "prompt_id": "query_%04d" % (i + 1),
+        }
+        for i in range(n)
+    ]
+
+def run_benchmarks(fixtures, prompts, repeat=5):
+    pages = [fx["page"] for fx in fixtures]
+    messages = [select_latest_response(p) or "" for p in pages]
+    results = sample_results(fixtures, prompts)
+
+    def select_all():
+        for p in pages:
+            select_latest_response(p)
+
+    def extract_all():
+        for m in messages:
+            extract_response_text(m)
+
+    def sanitize_all():
+        for p in prompts:
+            sanitize_prompt(p)
+
+    def serialize_all():
+        # same call the scraper uses for results_batch_N.json
+        json.dump(results, io.StringIO(), indent=2, ensure_ascii=False)
+
+    return {
+        "select_latest_response": measure(select_all, len(pages), repeat),
+        "extract_response_text": measure(extract_all, len(messages), repeat),
+        "sanitize_prompt": measure(sanitize_all, len(prompts), repeat),
+        "serialize_results": measure(serialize_all, len(results), repeat),
+    }
+
+def compare(report, baseline, tolerance=0.25):
+    regressions = []
+    for name, cur in report["benchmarks"].items():
+        base = baseline.get("benchmarks", {}).get(name)
+        if not base:
+            continue
+        for key in ("per_item_us", "peak_kb"):
+            if base.get(key) and cur[key] > base[key] * (1 + tolerance):
+                regressions.append({
+                    "benchmark": name,
+                    "metric": key,
+                    "baseline": base[key],
+                    "current": cur[key],
+                    "change": round(cur[key] / base[key] - 1, 3),
+                })
+    return regressions
+
+# ====================== Entry ======================
+
+def main():
+    fixtures_dir = os.environ.get("FIXTURES_DIR", os.path.join("benchmarks", "fixtures"))
+    queries_file = os.environ.get("QUERIES_FILE", "merlinAi.json")
+    out_file = os.environ.get("BENCH_OUT", "bench_report.json")
+    baseline_file = os.environ.get("BENCH_BASELINE", "").strip()
+    tolerance = env_float("BENCH_TOLERANCE", 0.25)
+    repeat = max(1, env_int("BENCH_REPEAT", 5))
+
+    fixtures = load_fixtures(fixtures_dir)
+    cases_path = os.path.join(fixtures_dir, "sanitize_cases.json")
+    sanitize_cases = load_json(cases_path) if os.path.exists(cases_path) else []
+    prompts = [q.get("text", "") for q in load_json(queries_file).get("queries", [])] if os.path.exists(queries_file) else []
+
+    golden = check_golden(fixtures, sanitize_cases)
+    print(f"[GOLDEN] {golden['checked'] - len(golden['failed'])}/{golden['checked']} passed")
+    for f in golden["failed"]:
+        print(f"[GOLDEN][FAIL] {f.get('fixture') or f.get('sanitize')!r}")
+
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "golden": golden,
+        "benchmarks": run_benchmarks(fixtures, prompts, repeat),
+    }
+    for name, b in report["benchmarks"].items():
+        print(f"[BENCH] {name:24s} {b['per_item_us']:>10.1f} us/item  {b['items_per_sec']:>12.1f} items/s  peak {b['peak_kb']:.1f} KB")
+
+    if baseline_file:
+        report["baseline"] = baseline_file
+        report["regressions"] = compare(report, load_json(baseline_file), tolerance)
+        for r in report["regressions"]:
+            print(f"[REGRESSION] {r['benchmark']} {r['metric']}: {r['baseline']} -> {r['current']} (+{r['change']:.0%})")
+
+    with open(out_file, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"[✓] Report saved to {out_file}")
+
+    failed = bool(golden["failed"]) or bool(report.get("regressions"))
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Offline clustering of scraped answers per query type.
+
+Builds a TF-IDF matrix over successful responses (sparse via scipy when it is
+installed, dense NumPy otherwise), then groups each query type's answers with
+mini-batch spherical k-means or greedy cosine-threshold grouping. The output
+lists every cluster's size and a representative answer, so reviewers can read
+a few dozen representatives instead of every response.
+
+Env:
+    RESULTS_FILE       combined results JSON (default combined_results.json)
+    QUERIES_FILE       prompt corpus (default merlinAi.json)
+    OUT_FILE           output JSON (default response_clusters.json)
+    CLUSTER_METHOD     "kmeans" or "threshold" (default kmeans)
+    CLUSTER_K          clusters per type for kmeans (default ~sqrt(n/2))
+    CLUSTER_THRESHOLD  cosine similarity for threshold grouping (default 0.5)
+    MAX_FEATURES       vocabulary cap, by document frequency (default 5000)
+"""
+
+import json
+import os
+import re
+from collections import Counter, defaultdict
+
+import numpy as np
+
+from scrape_utils import (
+    env_float,
+    env_int,
+    is_error_response,
+    load_json,
+    load_query_index,
+    result_query,
+)
+
+try:
+    import scipy.sparse as sp
+except ImportError:
+    sp = None
+
+TOKEN_RE = re.compile(r"[a-z0-9][a-z0-9'\-]*[a-z0-9]")
+
+STOPWORDS = frozenset("""
+a about above after again all also an and any are as at be because been before
+being below between both but by can could did do does doing down during each
+few for from further had has have having here how i if in into is it its itself
+just more most my no nor not of off on once only or other our out over own same
+should so some such than that the their them then there these they this those
+through to too under until up very was we were what when where which while who
+why will with would you your
+""".split())
+
+# ====================== TF-IDF ======================
+
+def tokenize(text):
+    return [t for t in TOKEN_RE.findall(str(text).lower()) if t not in STOPWORDS]
+
+def build_tfidf(texts, max_features=5000):
+    """
+    Sublinear TF-IDF over texts, rows L2-normalized.
+    Returns (matrix, vocabulary list). The matrix is scipy CSR when scipy is
+    available, otherwise a dense float32 ndarray; both support `@` and row
+    indexing, which is all the clustering below uses.
+    """
+    counts = [Counter(tokenize(t)) for t in texts]
+    df = Counter()
+    for c in counts:
+        df.update(c.keys())
+    vocab = [w for w, _ in df.most_common(max_features)]
+    col = {w: j for j, w in enumerate(vocab)}
+
+    indptr = [0]
+    indices = []
+    tf = []
+    for c in counts:
+        for w, n in c.items():
+            j = col.get(w)
+            if j is not None:
+                indices.append(j)
+                tf.append(n)
+        indptr.append(len(indices))
+
+    indptr = np.asarray(indptr, dtype=np.int64)
+    indices = np.asarray(indices, dtype=np.int64)
+    data = 1.0 + np.log(np.asarray(tf, dtype=np.float32))
+
+    n_docs = len(texts)
+    dfv = np.asarray([df[w] for w in vocab], dtype=np.float32)
+    idf = np.log((1.0 + n_docs) / (1.0 + dfv)) + 1.0
+    data *= idf[indices]
+
+    # Row L2 norms without materializing the matrix
+    row_of = np.repeat(np.arange(n_docs), np.diff(indptr))
+    sq = np.zeros(n_docs, dtype=np.float32)
+    np.add.at(sq, row_of, data * data)
+    norms = np.sqrt(sq)
+    norms[norms == 0] = 1.0
+    data /= norms[row_of]
+
+    shape = (n_docs, len(vocab))
+    if sp is not None:
+        return sp.csr_matrix((data, indices, indptr), shape=shape), vocab
+    X = np.zeros(shape, dtype=np.float32)
+    X[row_of, indices] = data
+    return X, vocab
+
+def _dense(m):
+    return m.toarray() if hasattr(m, "toarray") else np.asarray(m)
+
+def _normalize_rows(m):
+    norms = np.linalg.norm(m, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return m / norms
+
+# ====================== Clustering ======================
+
+def minibatch_kmeans(X, k, batch_size=256, iters=50, seed=0):
+    """
+    Spherical mini-batch k-means on L2-normalized rows.
+    Each step assigns a batch with one matrix product and moves every centre
+    toward its batch mean with a per-centre learning rate of 1/count.
+    """
+    n = X.shape[0]
+    rng = np.random.default_rng(seed)
+    k = max(1, min(k, n))
+
+    # k-means++ seeding on cosine distance
+    first = int(rng.integers(n))
+    centers = [_dense(X[first:first + 1])[0]]
+    closest = 1.0 - _dense(X @ centers[0].reshape(-1, 1)).ravel()
+    for _ in range(1, k):
+        w = np.clip(closest, 0, None) ** 2
+        if w.sum() <= 0:
+            idx = int(rng.integers(n))
+        else:
+            idx = int(rng.choice(n, p=w / w.sum()))
+        c = _dense(X[idx:idx + 1])[0]
+        centers.append(c)
+        closest = np.minimum(closest, 1.0 - _dense(X @ c.reshape(-1, 1)).ravel())
+    C = np.vstack(centers).astype(np.float32)
+
+    counts = np.zeros(k, dtype=np.float32)
+    batch_size = min(batch_size, n)
+    for _ in range(iters):
+        batch = rng.choice(n, size=batch_size, replace=False)
+        Xb = _dense(X[batch])
+        labels = np.argmax(Xb @ C.T, axis=1)
+        sums = np.zeros_like(C)
+        np.add.at(sums, labels, Xb)
+        nb = np.bincount(labels, minlength=k).astype(np.float32)
+        hit = nb > 0
+        counts[hit] += nb[hit]
+        lr = (nb[hit] / counts[hit])[:, None]
+        C[hit] = (1.0 - lr) * C[hit] + lr * (sums[hit] / nb[hit][:, None])
+        C = _normalize_rows(C)
+
+    return np.asarray(np.argmax(_dense(X @ C.T), axis=1)).ravel()
+
+def threshold_groups(X, threshold=0.5):
+    """
+    Greedy leader grouping: the first unassigned answer opens a group and
+    absorbs every unassigned answer whose cosine similarity to it is at least
+    threshold. One similarity matrix, one vectorized pass per leader.
+    """
+    n = X.shape[0]
+    S = _dense(X @ X.T)
+    labels = np.full(n, -1, dtype=np.int64)
+    group = 0
+    for leader in range(n):
+        if labels[leader] != -1:
+            continue
+        members = (labels == -1) & (S[leader] >= threshold)
+        members[leader] = True
+        labels[members] = group
+        group += 1
+    return labels
+
+def summarize_clusters(X, labels, records):
+    """
+    Size, cohesion and representative (closest to the centroid) per cluster,
+    largest first.
+    """
+    out = []
+    for c in np.unique(labels):
+        idx = np.flatnonzero(labels == c)
+        Xc = _dense(X[idx])
+        centroid = _normalize_rows(Xc.mean(axis=0, keepdims=True))[0]
+        sims = Xc @ centroid
+        rep = records[idx[int(np.argmax(sims))]]
+        out.append({
+            "size": int(len(idx)),
+            "cohesion": round(float(sims.mean()), 4),
+            "representative": {
+                "prompt_id": rep.get("prompt_id"),
+                "prompt": rep.get("prompt"),
+                "response": rep.get("response"),
+            },
+            "members": [records[i].get("prompt_id") for i in idx],
+        })
+    out.sort(key=lambda c: -c["size"])
+    return out
+
+def cluster_by_type(results, query_index, method="kmeans", k=None, threshold=0.5, max_features=5000):
+    by_type = defaultdict(list)
+    for r in results:
+        if is_error_response(r):
+            continue
+        qtype = result_query(r, query_index).get("type") or "unknown"
+        by_type[qtype].append(r)
+
+    report = {}
+    for qtype in sorted(by_type):
+        records = by_type[qtype]
+        X, _ = build_tfidf([r.get("response", "") for r in records], max_features=max_features)
+        if method == "threshold":
+            labels = threshold_groups(X, threshold=threshold)
+        else:
+            kk = k or max(1, int(round((len(records) / 2) ** 0.5)))
+            labels = minibatch_kmeans(X, kk)
+        clusters = summarize_clusters(X, labels, records)
+        report[qtype] = {"responses": len(records), "clusters": clusters}
+        print(f"[CLUSTER] {qtype}: {len(records)} responses -> {len(clusters)} clusters")
+    return report
+
+# ====================== Entry ======================
+
+def main():
+    results_file = os.environ.get("RESULTS_FILE", "combined_results.json")
+    queries_file = os.environ.get("QUERIES_FILE", "merlinAi.json")
+    out_file = os.environ.get("OUT_FILE", "response_clusters.json")
+    method = os.environ.get("CLUSTER_METHOD", "kmeans").strip().lower()
+    k = env_int("CLUSTER_K", 0) or None
+
+    results = load_json(results_file)
+    report = cluster_by_type(
+        results,
+        load_query_index(queries_file),
+        method=method,
+        k=k,
+        threshold=env_float("CLUSTER_THRESHOLD", 0.5),
+        max_features=env_int("MAX_FEATURES", 5000),
+    )
+
+    with open(out_file, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+
+    reps = sum(len(v["clusters"]) for v in report.values())
+    total = sum(v["responses"] for v in report.values())
+    print(f"[✓] {total} responses -> {reps} representatives ({method}), saved to {out_file}")
+    return report
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Incremental runs: scrape only queries that are new or changed since the last run.
+
+The manifest maps each query id to a hash of its sanitized text. It is written
+after a run and only lists queries whose result was successful, so failed
+queries are retried next time.
+
+Modes (argv[1] or DIFF_MODE):
+    plan    compare QUERIES_FILE with PREV_MANIFEST and write RUN_CORPUS_FILE,
+            a corpus in the merlinAi.json layout holding only new/changed
+            queries (all queries if there is no manifest or FULL_RUN=1).
+            The scraper runs it via QUERIES_FILE.
+    merge   combine this run's RESULTS_FILE with PREV_RESULTS: queries whose
+            text still matches PREV_MANIFEST carry over their previous result,
+            query_index is reset to the position in the full corpus, and a new
+            manifest is written.
+
+Env:
+    QUERIES_FILE      full corpus (default merlinAi.json)
+    PREV_MANIFEST     last run's manifest (default previous/corpus_manifest.json)
+    PREV_RESULTS      last run's combined results (default previous/combined_results.json)
+    RUN_CORPUS_FILE   plan output (default run_corpus.json)
+    RESULTS_FILE      this run's combined results (default combined_results.json)
+    OUT_FILE          merged results (default combined_results.json)
+    MANIFEST_FILE     new manifest (default corpus_manifest.json)
+    FULL_RUN          1 to schedule every query
+"""
+
+import hashlib
+import json
+import os
+import sys
+import time
+
+from scrape_utils import env_int, is_error_response, load_json, sanitize_prompt
+
+# ====================== Manifest ======================
+
+def query_hash(query):
+    return hashlib.sha1(sanitize_prompt(query.get("text", "")).encode("utf-8")).hexdigest()
+
+def load_manifest(path):
+    if not os.path.exists(path):
+        print(f"[DIFF] No previous manifest at {path}")
+        return {}
+    return load_json(path).get("queries", {})
+
+def diff_corpus(queries, manifest):
+    """
+    Split query ids into new / changed / unchanged, plus ids that were
+    removed from the corpus since the manifest was written.
+    """
+    out = {"new": [], "changed": [], "unchanged": []}
+    for q in queries:
+        qid = q.get("id")
+        prev = manifest.get(qid)
+        if prev is None:
+            out["new"].append(qid)
+        elif prev != query_hash(q):
+            out["changed"].append(qid)
+        else:
+            out["unchanged"].append(qid)
+    current = {q.get("id") for q in queries}
+    out["removed"] = [qid for qid in manifest if qid not in current]
+    return out
+
+def latest_by_id(results):
+    by_id = {}
+    for r in results:
+        by_id[r.get("prompt_id")] = r
+    return by_id
+
+# ====================== Modes ======================
+
+def plan(queries_file, prev_manifest, run_corpus_file, full_run=False):
+    data = load_json(queries_file)
+    queries = data.get("queries", [])
+    manifest = {} if full_run else load_manifest(prev_manifest)
+    diff = diff_corpus(queries, manifest)
+
+    todo = set(diff["new"]) | set(diff["changed"])
+    run = [q for q in queries if q.get("id") in todo]
+    metadata = dict(data.get("metadata", {}), total_queries=len(run), incremental_from=len(queries))
+    with open(run_corpus_file, "w", encoding="utf-8") as f:
+        json.dump({"metadata": metadata, "queries": run}, f, indent=2, ensure_ascii=False)
+
+    print(f"[DIFF] new={len(diff['new'])} changed={len(diff['changed'])} "
+          f"unchanged={len(diff['unchanged'])} removed={len(diff['removed'])}")
+    print(f"[✓] {len(run)}/{len(queries)} queries scheduled, saved to {run_corpus_file}")
+    return diff
+
+def merge(queries_file, results_file, prev_manifest, prev_results_file, out_file, manifest_file):
+    queries = load_json(queries_file).get("queries", [])
+    old_manifest = load_manifest(prev_manifest)
+    fresh = latest_by_id(load_json(results_file)) if os.path.exists(results_file) else {}
+    prev = latest_by_id(load_json(prev_results_file)) if os.path.exists(prev_results_file) else {}
+
+    merged = []
+    manifest = {}
+    carried = 0
+    for qi, q in enumerate(queries):
+        qid = q.get("id")
+        r = fresh.get(qid)
+        # Only carry over answers to the same text; a changed query that
+        # failed to run this time is left out rather than given a stale answer
+        if r is None and qid in prev and old_manifest.get(qid) == query_hash(q):
+            r = dict(prev[qid], carried_over=True)
+            carried += 1
+        if r is None:
+            continue
+        r["query_index"] = qi
+        merged.append(r)
+        if not is_error_response(r):
+            manifest[qid] = query_hash(q)
+
+    with open(out_file, "w", encoding="utf-8") as f:
+        json.dump(merged, f, indent=2, ensure_ascii=False)
+    with open(manifest_file, "w", encoding="utf-8") as f:
+        json.dump({"created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()), "queries": manifest}, f, indent=2)
+
+    print(f"[DIFF] {len(fresh)} fresh results, {carried} carried over, {len(queries) - len(merged)} missing")
+    print(f"[✓] {len(merged)} results saved to {out_file}, manifest ({len(manifest)} ok) to {manifest_file}")
+    return merged
+
+# ====================== Entry ======================
+
+def main():
+    mode = (sys.argv[1] if len(sys.argv) > 1 else os.environ.get("DIFF_MODE", "plan")).strip().lower()
+    queries_file = os.environ.get("QUERIES_FILE", "merlinAi.json")
+
+    if mode == "plan":
+        return plan(
+            queries_file,
+            os.environ.get("PREV_MANIFEST", os.path.join("previous", "corpus_manifest.json")),
+            os.environ.get("RUN_CORPUS_FILE", "run_corpus.json"),
+            full_run=bool(env_int("FULL_RUN", 0)),
+        )
+    if mode == "merge":
+        return merge(
+            queries_file,
+            os.environ.get("RESULTS_FILE", "combined_results.json"),
+            os.environ.get("PREV_MANIFEST", os.path.join("previous", "corpus_manifest.json")),
+            os.environ.get("PREV_RESULTS", os.path.join("previous", "combined_results.json")),
+            os.environ.get("OUT_FILE", "combined_results.json"),
+            os.environ.get("MANIFEST_FILE", "corpus_manifest.json"),
+        )
+    print(f"[ERROR] Unknown mode {mode!r}; use plan or merge")
+    sys.exit(2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Columnar export of combined results.
+
+Low-cardinality dimensions (type, persona, primary_topic, batch_id, status)
+are dictionary-encoded; prompt, response, response_html and screenshot path
+are separate string columns, so reading "status by type" touches two small
+columns instead of parsing the whole JSON. response and response_html are
+exported exactly as stored in the results.
+
+With pyarrow installed this writes a Parquet file. Without it, it writes an
+Arrow-style directory that needs nothing beyond the stdlib to produce and can
+be memory-mapped by NumPy:
+
+    <name>.columns/meta.json        row count, column kinds, dictionaries
+    <name>.columns/<col>.i32        dictionary codes, int32 LE (-1 = null)
+    <name>.columns/<col>.i64        integers, int64 LE (-1 = null)
+    <name>.columns/<col>.offsets    string offsets, int64 LE (rows + 1)
+    <name>.columns/<col>.utf8       concatenated UTF-8 string data
+
+    np.fromfile(".../status.i32", dtype="<i4")  -> codes; meta["dictionaries"]["status"] -> labels
+
+Env:
+    RESULTS_FILE     combined results JSON (default combined_results.json)
+    QUERIES_FILE     prompt corpus (default merlinAi.json)
+    OUT_BASE         output path without extension (default combined_results)
+    COLUMNAR_FORMAT  "auto", "parquet" or "columns" (default auto)
+"""
+
+import json
+import os
+import sys
+from array import array
+
+from scrape_utils import iter_json_array, load_query_index, result_query, result_status
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+DICT_COLUMNS = ["type", "persona", "primary_topic", "batch_id", "status"]
+INT_COLUMNS = ["query_index", "chars"]
+STRING_COLUMNS = ["prompt_id", "prompt", "response", "response_html", "screenshot"]
+
+# ====================== Rows -> Columns ======================
+
+def collect_columns(results, query_index):
+    cols = {name: [] for name in DICT_COLUMNS + INT_COLUMNS + STRING_COLUMNS}
+    for r in results:
+        q = result_query(r, query_index)
+        status = result_status(r)
+        cols["type"].append(q.get("type"))
+        cols["persona"].append(q.get("persona"))
+        cols["primary_topic"].append(q.get("primary_topic"))
+        cols["batch_id"].append(None if r.get("batch_id") is None else str(r.get("batch_id")))
+        cols["status"].append(status)
+        cols["query_index"].append(r.get("query_index"))
+        cols["chars"].append(len(r.get("response") or "") if status == "ok" else 0)
+        cols["prompt_id"].append(None if r.get("prompt_id") is None else str(r.get("prompt_id")))
+        cols["prompt"].append(r.get("prompt"))
+        cols["response"].append(r.get("response"))
+        cols["response_html"].append(r.get("response_html"))
+        cols["screenshot"].append(r.get("screenshot"))
+    return cols
+
+def dictionary_encode(values):
+    """
+    (codes, dictionary) with -1 for None; dictionary in first-seen order.
+    """
+    lookup = {}
+    codes = array("i")
+    for v in values:
+        if v is None:
+            codes.append(-1)
+            continue
+        code = lookup.get(v)
+        if code is None:
+            code = lookup[v] = len(lookup)
+        codes.append(code)
+    return codes, list(lookup)
+
+# ====================== Writers ======================
+
+def write_parquet(cols, path):
+    arrays = {}
+    for name in DICT_COLUMNS:
+        arrays[name] = pa.array(cols[name], type=pa.string()).dictionary_encode()
+    for name in INT_COLUMNS:
+        arrays[name] = pa.array(cols[name], type=pa.int64())
+    for name in STRING_COLUMNS:
+        arrays[name] = pa.array(cols[name], type=pa.string())
+    table = pa.table(arrays)
+    pq.write_table(table, path, compression="zstd")
+    return table.num_rows
+
+def _write_le(arr, path):
+    if sys.byteorder != "little":
+        arr = array(arr.typecode, arr)
+        arr.byteswap()
+    with open(path, "wb") as f:
+        arr.tofile(f)
+
+def write_columns_dir(cols, out_dir):
+    os.makedirs(out_dir, exist_ok=True)
+    rows = len(cols["status"])
+    meta = {"rows": rows, "columns": {}, "dictionaries": {}}
+
+    for name in DICT_COLUMNS:
+        codes, dictionary = dictionary_encode(cols[name])
+        _write_le(codes, os.path.join(out_dir, f"{name}.i32"))
+        meta["columns"][name] = "dictionary"
+        meta["dictionaries"][name] = dictionary
+
+    for name in INT_COLUMNS:
+        _write_le(array("q", (-1 if v is None else int(v) for v in cols[name])), os.path.join(out_dir, f"{name}.i64"))
+        meta["columns"][name] = "int64"
+
+    for name in STRING_COLUMNS:
+        offsets = array("q", [0])
+        with open(os.path.join(out_dir, f"{name}.utf8"), "wb") as f:
+            pos = 0
+            nulls = []
+            for idx, v in enumerate(cols[name]):
+                if v is None:
+                    nulls.append(idx)
+                else:
+                    b = str(v).encode("utf-8")
+                    f.write(b)
+                    pos += len(b)
+                offsets.append(pos)
+        _write_le(offsets, os.path.join(out_dir, f"{name}.offsets"))
+        meta["columns"][name] = "string"
+        if nulls:
+            meta.setdefault("nulls", {})[name] = nulls
+
+    with open(os.path.join(out_dir, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2, ensure_ascii=False)
+    return rows
+
+# ====================== Reader ======================
+
+def read_column(out_dir, name):
+    """
+    One column from a .columns directory as a Python list; dictionary
+    columns are decoded to their labels.
+    """
+    with open(os.path.join(out_dir, "meta.json"), "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    kind = meta["columns"][name]
+
+    def load(suffix, typecode):
+        arr = array(typecode)
+        with open(os.path.join(out_dir, f"{name}.{suffix}"), "rb") as f:
+            arr.frombytes(f.read())
+        if sys.byteorder != "little":
+            arr.byteswap()
+        return arr
+
+    if kind == "dictionary":
+        labels = meta["dictionaries"][name]
+        return [labels[c] if c >= 0 else None for c in load("i32", "i")]
+    if kind == "int64":
+        return [None if v == -1 else v for v in load("i64", "q")]
+    offsets = load("offsets", "q")
+    with open(os.path.join(out_dir, f"{name}.utf8"), "rb") as f:
+        blob = f.read()
+    nulls = set(meta.get("nulls", {}).get(name, []))
+    return [
+        None if idx in nulls else blob[offsets[idx]:offsets[idx + 1]].decode("utf-8")
+        for idx in range(meta["rows"])
+    ]
+
+# ====================== Entry ======================
+
+def main():
+    results_file = os.environ.get("RESULTS_FILE", "combined_results.json")
+    queries_file = os.environ.get("QUERIES_FILE", "merlinAi.json")
+    out_base = os.environ.get("OUT_BASE", "combined_results")
+    fmt = os.environ.get("COLUMNAR_FORMAT", "auto").strip().lower()
+
+    if fmt == "parquet" and pa is None:
+        print("[ERROR] COLUMNAR_FORMAT=parquet needs pyarrow (pip install pyarrow)")
+        sys.exit(2)
+    if fmt == "auto":
+        fmt = "parquet" if pa is not None else "columns"
+
+    cols = collect_columns(iter_json_array(results_file), load_query_index(queries_file))
+    if fmt == "parquet":
+        out = out_base + ".parquet"
+        rows = write_parquet(cols, out)
+    else:
+        out = out_base + ".columns"
+        rows = write_columns_dir(cols, out)
+
+    print(f"[✓] {rows} rows exported ({fmt}) to {out}")
+    return out
+
+if __name__ == "__main__":
+    main()
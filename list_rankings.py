@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Brand rank extraction for listicle-style answers.
+
+Each response is walked once to pull out its rankings from the saved
+assistant HTML: top-level <ol>/<ul> items and numbered headings, ranked by
+their ordinal (<ol start> included, and a numbered list split by paragraphs
+counts as one). Nested sub-lists belong to their parent item, and bullet
+lists of a single item are not rankings. Every list item is matched against
+all tracked brands with a single combined regex, and each brand's first
+placement (ordinal, list length) is recorded. Placements are
+aggregated per query type into mergeable sums: listed count, rank sum, top-3
+count and list-length sum, from which avg rank and top-3 rate are derived.
+
+Rankings only cover results saved with SAVE_RESPONSE_HTML=1. The stored
+"response" text is BeautifulSoup .text, which has lost the list numbering and
+bullets, so results without "response_html" almost never yield lists. They
+fall back to markdown/plain-text markers for text that still has them, and
+are counted as "no_html" in every bucket so a report over old runs says why
+it has no lists.
+
+Env:
+    RESULTS_FILES    comma-separated results files, one per run
+                     (default combined_results.json)
+    QUERIES_FILE     prompt corpus (default merlinAi.json)
+    OUT_FILE         output JSON (default list_rankings.json)
+    TRACKED_BRANDS   optional comma-separated brand override
+"""
+
+import json
+import os
+import re
+from html.parser import HTMLParser
+
+from scrape_utils import (
+    compile_brand_pattern,
+    find_mentions,
+    is_error_response,
+    iter_json_array,
+    load_query_index,
+    result_query,
+)
+
+HEADING_TAGS = {"h1", "h2", "h3", "h4", "h5", "h6"}
+NUMBERED_RE = re.compile(r"^\s*(\d{1,3})[.)]\s+(.*)")
+BULLET_RE = re.compile(r"^\s*[-*+•]\s+(.*)")
+MD_HEADING_RE = re.compile(r"^\s*#{1,6}\s+(.*)")
+
+# ====================== List Parsing ======================
+
+def _int_attr(value, default):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+def ranking_lists(lists):
+    """
+    (rank, text) items of every list that counts as a ranking: any numbered
+    list, and bullet lists of at least two items. lists holds
+    (ordered, [[rank, text], ...]) pairs.
+    """
+    return [
+        [(rank, " ".join(text.split())) for rank, text in items]
+        for ordered, items in lists
+        if items and (ordered or len(items) >= 2)
+    ]
+
+class ListItemParser(HTMLParser):
+    """
+    Streaming parser collecting ranked list items from assistant HTML.
+
+    Top-level <ol>/<ul> elements become lists; an item's rank is its ordinal,
+    honouring <ol start> and <li value>. Text inside a nested list belongs to
+    the parent item, not to a ranking of its own. An <ol start="N"> that
+    picks up where the previous <ol> stopped (answers split one list with
+    paragraphs) continues that list. Runs of same-level headings that start
+    with "1.", "2.", ... are treated as a list too, since answers often format
+    rankings as "### 1. Vendor". Lists are kept in the order they open.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.lists = []          # (ordered, items); items are [rank, text]
+        self._depth = 0          # open <ol>/<ul> elements
+        self._items = None       # items of the open top-level list
+        self._next = 1           # ordinal of the next top-level <li>
+        self._last_ol = None     # items of the last top-level <ol>
+        self._heading = None     # (tag, text parts) while inside a heading
+        self._heading_run = None # (tag, items) for consecutive numbered headings
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag in ("ol", "ul"):
+            self._depth += 1
+            if self._depth > 1:
+                return
+            start = _int_attr(attrs.get("start"), 1) if tag == "ol" else 1
+            last = self._last_ol
+            if tag == "ol" and start > 1 and last and last[-1][0] == start - 1:
+                self._items = last
+            else:
+                self._items = []
+                self.lists.append((tag == "ol", self._items))
+                if tag == "ol":
+                    self._last_ol = self._items
+            self._next = start
+        elif tag == "li" and self._depth == 1:
+            rank = _int_attr(attrs.get("value"), self._next)
+            self._items.append([rank, ""])
+            self._next = rank + 1
+        elif tag == "li" and self._depth > 1 and self._items:
+            self._items[-1][1] += " "
+        elif tag in HEADING_TAGS:
+            self._heading = (tag, [])
+
+    def handle_endtag(self, tag):
+        if tag in ("ol", "ul") and self._depth:
+            self._depth -= 1
+            if not self._depth:
+                self._items = None
+        elif tag in HEADING_TAGS and self._heading and self._heading[0] == tag:
+            text = "".join(self._heading[1]).strip()
+            self._heading = None
+            m = NUMBERED_RE.match(text)
+            if not m:
+                self._heading_run = None
+            else:
+                rank = int(m.group(1))
+                run = self._heading_run
+                if not run or run[0] != tag or rank <= run[1][-1][0]:
+                    self._heading_run = (tag, [])
+                    self.lists.append((True, self._heading_run[1]))
+                self._heading_run[1].append([rank, m.group(2)])
+
+    def handle_data(self, data):
+        if self._heading is not None:
+            self._heading[1].append(data)
+        elif self._items:
+            self._items[-1][1] += data
+
+    def close(self):
+        super().close()
+        self.lists = ranking_lists(self.lists)
+
+def lists_from_html(html_text):
+    p = ListItemParser()
+    p.feed(html_text)
+    p.close()
+    return p.lists
+
+def lists_from_text(text):
+    """
+    Ranked lists from markdown or plain text, one pass over the lines, with
+    the same rules as ListItemParser. Ranks come from the "N." markers. Inside
+    a list, indented lines (sub-bullets included) and blank lines continue the
+    current item. A numbered list that resumes after a paragraph at the next
+    number continues the previous one. Numbered markdown headings
+    ("### 1. Vendor") form a list whose items run until the next heading, so
+    bullets under a heading don't break the ranking.
+    """
+    lists = []
+    current = kind = None
+    last_numbered = None
+    for line in str(text or "").splitlines():
+        h = MD_HEADING_RE.match(line)
+        m = NUMBERED_RE.match(h.group(1) if h else line)
+        b = None if h or m else BULLET_RE.match(line)
+        item = (m.group(2) if m else b.group(1)).strip() if m or b else line.strip()
+        if kind == "heading" and not h:
+            if item:
+                current[-1][1] += " " + item
+            continue
+
+        # Indentation decides before markers do, or a sub-bullet would end its parent
+        if current is not None and not h and (not line.strip() or line[:1].isspace()):
+            if item:
+                current[-1][1] += " " + item
+            continue
+
+        if m or b:
+            item_kind = ("heading" if h else "numbered") if m else "bullet"
+            rank = int(m.group(1)) if m else None
+            if kind == item_kind and (rank is None or rank > current[-1][0]):
+                pass
+            elif item_kind == "numbered" and last_numbered and rank == last_numbered[-1][0] + 1:
+                current = last_numbered
+            else:
+                current = []
+                lists.append((item_kind != "bullet", current))
+            kind = item_kind
+            if kind == "numbered":
+                last_numbered = current
+            current.append([rank if rank is not None else len(current) + 1, item])
+        else:
+            current = kind = None
+    return ranking_lists(lists)
+
+def response_lists(result):
+    """
+    Lists of a result from its response_html; results saved without it fall
+    back to the plain response text, which rarely still has list markers.
+    """
+    html_text = result.get("response_html")
+    if html_text:
+        return lists_from_html(html_text)
+    return lists_from_text(result.get("response", ""))
+
+def brand_placements(lists, pattern, groups):
+    """
+    Brand -> (rank, list length) at the brand's first appearance in any list;
+    the list length is its highest ordinal.
+    """
+    placed = {}
+    for items in lists:
+        length = max(rank for rank, _ in items)
+        for rank, item in items:
+            for brand in find_mentions(item, pattern, groups):
+                if brand not in placed:
+                    placed[brand] = (rank, length)
+    return placed
+
+# ====================== Aggregation ======================
+
+def new_bucket():
+    return {"responses": 0, "with_lists": 0, "no_html": 0, "brands": {}}
+
+def add_placements(bucket, placements, has_lists, has_html=True):
+    bucket["responses"] += 1
+    bucket["with_lists"] += int(has_lists)
+    bucket["no_html"] += int(not has_html)
+    for brand, (rank, length) in placements.items():
+        s = bucket["brands"].setdefault(brand, {"listed": 0, "rank_sum": 0, "top3": 0, "list_len_sum": 0})
+        s["listed"] += 1
+        s["rank_sum"] += rank
+        s["top3"] += int(rank <= 3)
+        s["list_len_sum"] += length
+
+def merge_buckets(total, part):
+    total["responses"] += part["responses"]
+    total["with_lists"] += part["with_lists"]
+    # Buckets stored before no_html was counted don't have it
+    total["no_html"] = total.get("no_html", 0) + part.get("no_html", 0)
+    for brand, s in part["brands"].items():
+        t = total["brands"].setdefault(brand, {"listed": 0, "rank_sum": 0, "top3": 0, "list_len_sum": 0})
+        for k, v in s.items():
+            t[k] += v
+    return total
+
+def finalize_bucket(bucket):
+    brands = {}
+    for brand, s in sorted(bucket["brands"].items(), key=lambda kv: -kv[1]["listed"]):
+        n = s["listed"]
+        brands[brand] = dict(s, **{
+            "avg_rank": round(s["rank_sum"] / n, 2),
+            "top3_rate": round(s["top3"] / n, 3),
+            "avg_list_length": round(s["list_len_sum"] / n, 2),
+            "listed_rate": round(n / bucket["responses"], 3) if bucket["responses"] else 0,
+        })
+    return {
+        "responses": bucket["responses"],
+        "with_lists": bucket["with_lists"],
+        "no_html": bucket.get("no_html", 0),
+        "brands": brands,
+    }
+
+def warn_no_html(bucket):
+    if bucket.get("no_html"):
+        print(f"[WARN] {bucket['no_html']}/{bucket['responses']} responses have no response_html; "
+              f"their list numbering was lost, so rankings only cover runs saved with SAVE_RESPONSE_HTML=1")
+
+def rank_results(results, query_index, pattern, groups, by_type=None):
+    by_type = by_type if by_type is not None else {}
+    for r in results:
+        if is_error_response(r):
+            continue
+        qtype = result_query(r, query_index).get("type") or "unknown"
+        lists = response_lists(r)
+        add_placements(by_type.setdefault(qtype, new_bucket()), brand_placements(lists, pattern, groups),
+                       bool(lists), bool(r.get("response_html")))
+    return by_type
+
+# ====================== Entry ======================
+
+def main():
+    files = [p.strip() for p in os.environ.get("RESULTS_FILES", "combined_results.json").split(",") if p.strip()]
+    queries_file = os.environ.get("QUERIES_FILE", "merlinAi.json")
+    out_file = os.environ.get("OUT_FILE", "list_rankings.json")
+
+    query_index = load_query_index(queries_file)
+    pattern, groups = compile_brand_pattern()
+    by_type = {}
+    for path in files:
+        print(f"[RANK] Reading {path}")
+        rank_results(iter_json_array(path), query_index, pattern, groups, by_type)
+
+    overall = new_bucket()
+    for bucket in by_type.values():
+        merge_buckets(overall, bucket)
+
+    report = {
+        "runs": len(files),
+        "overall": finalize_bucket(overall),
+        "by_type": {t: finalize_bucket(b) for t, b in sorted(by_type.items())},
+    }
+    with open(out_file, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+
+    print(f"[✓] {overall['responses']} responses ({overall['with_lists']} with lists) across {len(files)} runs")
+    warn_no_html(overall)
+    print(f"[✓] Rankings saved to {out_file}")
+    return report
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Chunked post-processing of combined results over a process pool.
+
+Records are streamed out of the combined JSON array, grouped into chunks and
+fanned out to worker processes for the CPU-heavy stages (text normalization,
+brand mention matching, signatures, per-chunk stats). Only a bounded number of
+chunks is in flight at once, and chunk outputs are written back in input
+order, so memory stays flat and the output is deterministic.
+
+Env:
+    RESULTS_FILE     combined results JSON (default combined_results.json)
+    QUERIES_FILE     prompt corpus (default merlinAi.json)
+    OUT_FILE         processed records, JSON lines (default processed_results.jsonl)
+    STATS_FILE       merged stats (default results_stats.json)
+    WORKERS          process count (default os.cpu_count())
+    CHUNK_SIZE       records per chunk (default 64)
+    MAX_PENDING      chunks in flight (default 2 * WORKERS)
+"""
+
+import json
+import os
+import time
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from scrape_utils import (
+    compile_brand_pattern,
+    env_int,
+    find_mentions,
+    iter_json_array,
+    load_query_index,
+    normalize_text,
+    result_query,
+    result_status,
+    text_signature,
+)
+
+# ====================== Pipeline Runner ======================
+
+def chunked(iterable, size):
+    it = iter(iterable)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+def run_pipeline(records, process_chunk, workers=None, chunk_size=64, max_pending=None,
+                 initializer=None, initargs=()):
+    """
+    Apply process_chunk(list) -> output to chunks of records in a process pool
+    and yield the outputs in input order.
+
+    At most max_pending chunks are submitted ahead of the one being yielded;
+    the reader blocks on the oldest future when the window is full, which is
+    the backpressure that keeps a huge input from being read all at once.
+    """
+    workers = workers or os.cpu_count() or 1
+    max_pending = max(1, max_pending or 2 * workers)
+    with ProcessPoolExecutor(max_workers=workers, initializer=initializer, initargs=initargs) as pool:
+        pending = deque()
+        for chunk in chunked(records, chunk_size):
+            pending.append(pool.submit(process_chunk, chunk))
+            if len(pending) >= max_pending:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+# ====================== Stages ======================
+
+_QUERY_INDEX = {}
+_BRAND_PATTERN = None
+_BRAND_GROUPS = {}
+
+def init_worker(queries_file):
+    global _QUERY_INDEX, _BRAND_PATTERN, _BRAND_GROUPS
+    _QUERY_INDEX = load_query_index(queries_file)
+    _BRAND_PATTERN, _BRAND_GROUPS = compile_brand_pattern()
+
+def process_record(r):
+    q = result_query(r, _QUERY_INDEX)
+    status = result_status(r)
+    ok = status == "ok"
+    text = normalize_text(r.get("response", "")) if ok else ""
+    out = dict(r)
+    out.update({
+        "type": q.get("type"),
+        "persona": q.get("persona"),
+        "status": status,
+        "response_text": text,
+        "response_hash": text_signature(text) if ok else None,
+        "chars": len(text),
+        "words": len(text.split()),
+        "mentions": find_mentions(text, _BRAND_PATTERN, _BRAND_GROUPS) if ok else {},
+    })
+    return out
+
+def process_chunk(records):
+    """
+    Worker entry: process a chunk, return (records, partial stats).
+    """
+    out = [process_record(r) for r in records]
+    stats = {
+        "records": Counter(),
+        "status": Counter(),
+        "by_type": Counter(),
+        "ok_by_type": Counter(),
+        "mentions": Counter(),
+        "mentioned_in": Counter(),
+        "chars": 0,
+        "signatures": Counter(),
+    }
+    for r in out:
+        stats["records"]["total"] += 1
+        stats["status"][r["status"]] += 1
+        qtype = r["type"] or "unknown"
+        stats["by_type"][qtype] += 1
+        if r["status"] == "ok":
+            stats["records"]["ok"] += 1
+            stats["ok_by_type"][qtype] += 1
+            stats["chars"] += r["chars"]
+            stats["signatures"][r["response_hash"]] += 1
+            for brand, n in r["mentions"].items():
+                stats["mentions"][brand] += n
+                stats["mentioned_in"][brand] += 1
+    return out, stats
+
+def merge_stats(total, part):
+    for key, val in part.items():
+        if isinstance(val, Counter):
+            total.setdefault(key, Counter()).update(val)
+        else:
+            total[key] = total.get(key, 0) + val
+    return total
+
+def finalize_stats(stats):
+    sigs = stats.pop("signatures", Counter())
+    ok = stats.get("records", Counter()).get("ok", 0)
+    out = {k: dict(v) if isinstance(v, Counter) else v for k, v in stats.items()}
+    out["avg_chars"] = round(stats.get("chars", 0) / ok, 1) if ok else 0
+    out["unique_responses"] = len(sigs)
+    out["duplicate_responses"] = sum(n - 1 for n in sigs.values() if n > 1)
+    return out
+
+# ====================== Entry ======================
+
+def main():
+    results_file = os.environ.get("RESULTS_FILE", "combined_results.json")
+    queries_file = os.environ.get("QUERIES_FILE", "merlinAi.json")
+    out_file = os.environ.get("OUT_FILE", "processed_results.jsonl")
+    stats_file = os.environ.get("STATS_FILE", "results_stats.json")
+    workers = env_int("WORKERS", os.cpu_count() or 1)
+    chunk_size = max(1, env_int("CHUNK_SIZE", 64))
+    max_pending = env_int("MAX_PENDING", 2 * workers)
+
+    print("\n" + "=" * 80)
+    print(f"Post-processing {results_file} with {workers} workers (chunk {chunk_size}, window {max_pending})")
+    print("=" * 80 + "\n")
+
+    t0 = time.time()
+    stats = {}
+    n = 0
+    with open(out_file, "w", encoding="utf-8") as f:
+        for records, part in run_pipeline(
+            iter_json_array(results_file),
+            process_chunk,
+            workers=workers,
+            chunk_size=chunk_size,
+            max_pending=max_pending,
+            initializer=init_worker,
+            initargs=(queries_file,),
+        ):
+            for r in records:
+                f.write(json.dumps(r, ensure_ascii=False) + "\n")
+            merge_stats(stats, part)
+            n += len(records)
+
+    stats = finalize_stats(stats)
+    with open(stats_file, "w", encoding="utf-8") as f:
+        json.dump(stats, f, indent=2, ensure_ascii=False)
+
+    print(f"[✓] {n} records processed in {time.time() - t0:.1f}s")
+    print(f"[✓] Records saved to {out_file}, stats to {stats_file}")
+    return stats
+
+if __name__ == "__main__":
+    main()
@@ -8,6 +8,8 @@ import random
 import time
 from contextlib import suppress
 from seleniumbase import SB
+from screenshot_store import store_screenshot
+from scrape_utils import RESPONSE_SELECTORS, env_int, extract_response_text, process_tree_memory_mb, sanitize_prompt
 
 # ====================== Utilities ======================
 
@@ -43,49 +45,14 @@ def click_first(sb, selectors, label=""):
     return None
 
 def save_ss(sb, name):
-    path = f"screenshots/{name}_{int(time.time())}.png"
+    # Batch prefix keeps paths unique once the per-batch stores are merged
+    path = f"screenshots/b{os.environ.get('BATCH_NUMBER', '1')}_{name}_{int(time.time())}.png"
     with suppress(Exception):
         sb.save_screenshot(path)
-        print(f"[SCREENSHOT] {path}")
+        sha = store_screenshot(path)
+        print(f"[SCREENSHOT] {path} -> {sha[:12]}")
     return path
 
-def sanitize_prompt(p):
-    """
-    Normalize a raw prompt string, strip any leading 'prompt'/'delete'/'query' prefix,
-    even if FUSED DIRECTLY to next text (e.g., 'DeleteAs...' -> 'As...').
-    Remains otherwise unchanged.
-    """
-    if p is None:
-        return ""
-
-    s = str(p).replace("\u200b", "")
-    s = s.replace("[", "").replace("]", "").strip()
-
-    # Remove any number of leading occurrences (fused or spaced) at the start
-    before = None
-    pattern = re.compile(r'^(?:prompt|delete|query)+', flags=re.I)
-    while s != before:
-        before = s
-        s = pattern.sub("", s).strip()
-
-    # Remove any number of control words with separators (space, colon, dash)
-    separator_pattern = re.compile(r'^\s*((?:prompt|delete|query)\s*[:\-]?\s*)+', flags=re.I)
-    while s != before:
-        before = s
-        s = separator_pattern.sub("", s, count=1).strip()
-
-    # Normalize spaces
-    s = re.sub(r'\s+', ' ', s).strip()
-    return s
-
-
-def _env_int(name, default):
-    try:
-        v = os.environ.get(name, "")
-        return int(v) if str(v).strip() else default
-    except Exception:
-        return default
-
 def is_incorrect_credentials_page(sb, timeout=5, screenshot_name="incorrect_credentials_detected"):
     """
     Detects if the current page is showing an "Incorrect email address or password" error.
@@ -152,13 +119,22 @@ ACCOUNTS = [
 
 # ====================== Env / Batching ======================
 
-batch_number   = _env_int("BATCH_NUMBER", 1)
-total_batches  = _env_int("TOTAL_BATCHES", 2)
-MAX_PROMPTS    = _env_int("MAX_PROMPTS", 50)
+batch_number   = env_int("BATCH_NUMBER", 1)
+total_batches  = env_int("TOTAL_BATCHES", 2)
+MAX_PROMPTS    = env_int("MAX_PROMPTS", 50)
+QUERIES_FILE   = os.environ.get("QUERIES_FILE", "merlinAi.json")
+SAVE_RESPONSE_HTML = env_int("SAVE_RESPONSE_HTML", 1)  # keep assistant HTML for list/rank analysis
+BATCH_DEADLINE_MINUTES  = env_int("BATCH_DEADLINE_MINUTES", 340)  # stop starting prompts past this (0 = off)
+PROMPT_ESTIMATE_SECONDS = env_int("PROMPT_ESTIMATE_SECONDS", 90)  # per-prompt cost until one is observed
+SESSION_ESTIMATE_SECONDS = env_int("SESSION_ESTIMATE_SECONDS", 120)  # browser open + login, until observed
+DEADLINE_RESERVE_SECONDS = env_int("DEADLINE_RESERVE_SECONDS", 60)  # kept free for writing output
+RUN_STARTED    = time.time()
+WATCHDOG_MEM_MB    = env_int("WATCHDOG_MEM_MB", 2500)      # recycle browser above this PSS sum (0 = off)
+WATCHDOG_DOM_NODES = env_int("WATCHDOG_DOM_NODES", 25000)  # recycle above this conversation node count (0 = off)
 ACC            = ACCOUNTS[(batch_number - 1) % len(ACCOUNTS)]
 cookies_verification=None
 password_reset=False
-with open("merlinAi.json", "r", encoding="utf-8") as f:
+with open(QUERIES_FILE, "r", encoding="utf-8") as f:
     data = json.load(f)
 all_prompts = [sanitize_prompt(q.get("text", "")) for q in data.get("queries", [])]
 
@@ -756,6 +732,67 @@ def try_send(sb):
         print(f"[SEND][ERROR] Enter fallback failed: {str(e)[:200]}")
         return False
 
+# ====================== Resource Watchdog ======================
+
+METRICS = {"prompt_seconds": [], "session_seconds": [], "recycles": [], "samples": []}
+
+def dom_node_count(sb):
+    try:
+        return int(sb.cdp.evaluate("document.getElementsByTagName('*').length"))
+    except Exception:
+        return None
+
+def watchdog_check(sb, prompt_index):
+    """
+    Sample browser memory and DOM size at a prompt boundary.
+    Returns a recycle reason if either is over its threshold, else None.
+    """
+    mem = process_tree_memory_mb()
+    nodes = dom_node_count(sb)
+    METRICS["samples"].append({
+        "prompt_index": prompt_index,
+        "mem_mb": round(mem, 1) if mem is not None else None,
+        "dom_nodes": nodes,
+    })
+    print(f"[WATCHDOG] mem={mem if mem is None else round(mem)}MB dom_nodes={nodes}")
+
+    reason = None
+    if WATCHDOG_MEM_MB and mem is not None and mem >= WATCHDOG_MEM_MB:
+        reason = "memory"
+    elif WATCHDOG_DOM_NODES and nodes is not None and nodes >= WATCHDOG_DOM_NODES:
+        reason = "dom_nodes"
+    if reason:
+        METRICS["recycles"].append(dict(METRICS["samples"][-1], reason=reason))
+        print(f"[WATCHDOG] {reason} over threshold -> recycling browser before prompt {prompt_index + 1}")
+    return reason
+
+# ====================== Deadline ======================
+
+def estimated_seconds(samples, default):
+    """
+    90th percentile of observed durations, or default before any are observed.
+    """
+    if not samples:
+        return default
+    ordered = sorted(samples)
+    return ordered[int(0.9 * (len(ordered) - 1))]
+
+def deadline_allows(label, with_session=False):
+    """
+    True if one more prompt (plus a browser open/login if with_session) is
+    expected to finish before BATCH_DEADLINE_MINUTES, keeping the reserve free.
+    """
+    if not BATCH_DEADLINE_MINUTES:
+        return True
+    remaining = RUN_STARTED + BATCH_DEADLINE_MINUTES * 60 - time.time()
+    need = estimated_seconds(METRICS["prompt_seconds"], PROMPT_ESTIMATE_SECONDS) + DEADLINE_RESERVE_SECONDS
+    if with_session:
+        need += estimated_seconds(METRICS["session_seconds"], SESSION_ESTIMATE_SECONDS)
+    if remaining < need:
+        print(f"[DEADLINE] {remaining:.0f}s left, next {label} needs ~{need:.0f}s -> deferring the rest")
+        return False
+    return True
+
 # ====================== Scraper ======================
 
 def scrape_chatgpt_responses(prompts):
@@ -764,12 +801,22 @@ def scrape_chatgpt_responses(prompts):
     i = 0
     max_retries = 2
     force_login_on_reopen = False
+    deferred = False
 
-    while i < total:
+    def add_result(result):
+        # Tag with the prompt's offset: retries can add several results per prompt
+        result["prompt_offset"] = i
+        results.append(result)
+
+    while i < total and not deferred:
         tries = 0
         while tries < max_retries and i < total:
+            if not deadline_allows("browser session", with_session=True):
+                deferred = True
+                break
             trigger_reopen = False
             try:
+                session_t = time.time()
                 with SB(uc=True, test=True, ad_block=True, locale="en") as sb:
                     url = "https://chatgpt.com/"
                     print("\n" + "=" * 80)
@@ -836,8 +883,21 @@ def scrape_chatgpt_responses(prompts):
                             save_ss(sb, "textarea_not_found_on_load")
                             trigger_reopen = True
                             force_login_on_reopen = True
+                    if not trigger_reopen:
+                        METRICS["session_seconds"].append(round(time.time() - session_t, 1))
 
+                    boundary_i, boundary_t = i, time.time()
                     while not trigger_reopen and i < total:
+                        # Prompt boundary: time the last prompt, recycle a bloated browser
+                        if i != boundary_i:
+                            METRICS["prompt_seconds"].append(round(time.time() - boundary_t, 1))
+                            boundary_i, boundary_t = i, time.time()
+                            if watchdog_check(sb, i):
+                                break
+                        if not deadline_allows("prompt"):
+                            deferred = True
+                            break
+
                         prompt_raw = prompts[i]
                         prompt = sanitize_prompt(prompt_raw)
                         print("[%d/%d] Sanitized prompt: %s" % (i + 1, total, (prompt[:100] if prompt else "")))
@@ -845,7 +905,7 @@ def scrape_chatgpt_responses(prompts):
 
                         if not prompt:
                             print("[WARN] Empty prompt after cleaning; skipping")
-                            results.append({
+                            add_result({
                                 "prompt": prompt_raw,
                                 "response": "Error: Empty prompt after cleaning",
                                 "screenshot": None,
@@ -892,7 +952,7 @@ def scrape_chatgpt_responses(prompts):
                             if not try_send(sb):
                                 print("Error:  Send failed -> reopen")
                                 screenshot_path = save_ss(sb, f"send_failed_{i+1}")
-                                results.append({
+                                add_result({
                                     "prompt": prompt_raw,
                                     "response": "Error: Send failed",
                                     "screenshot": screenshot_path,
@@ -908,15 +968,8 @@ def scrape_chatgpt_responses(prompts):
                             sleep_dbg(sb, a=10, b=15, label="extra wait after streaming")
 
                             # Extract last assistant message
-                            response_selectors = [
-                                '[data-message-author-role="assistant"] .markdown',
-                                '[data-message-author-role="assistant"] article',
-                                'div[data-message-author-role="assistant"]',
-                                '[class*="message"] [class*="markdown"]',
-                                '[role="article"] .markdown',
-                            ]
                             elems = []
-                            for sel in response_selectors:
+                            for sel in RESPONSE_SELECTORS:
                                 try:
                                     elems = sb.cdp.find_elements(sel)
                                     if elems:
@@ -927,7 +980,7 @@ def scrape_chatgpt_responses(prompts):
                             if not elems:
                                 print("[WARNING] No response found")
                                 screenshot_path = save_ss(sb, f"no_response_{i+1}")
-                                results.append({
+                                add_result({
                                     "prompt": prompt_raw,
                                     "response": "Error: No response",
                                     "screenshot": screenshot_path,
@@ -939,11 +992,11 @@ def scrape_chatgpt_responses(prompts):
 
                             try:
                                 latest = elems[-1].get_html()
-                                text = sb.get_beautiful_soup(latest).text.strip().replace("\n\n\n", "\n\n")
+                                text = extract_response_text(latest)
                             except Exception as e:
                                 print("[WARNING] Extract failed:", str(e)[:200])
                                 screenshot_path = save_ss(sb, f"extract_failed_{i+1}")
-                                results.append({
+                                add_result({
                                     "prompt": prompt_raw,
                                     "response": "Error: Extract failed",
                                     "screenshot": screenshot_path,
@@ -956,7 +1009,7 @@ def scrape_chatgpt_responses(prompts):
                             if not text or len(text) < 10:
                                 print("[WARNING] Response too short")
                                 screenshot_path = save_ss(sb, f"empty_response_{i+1}")
-                                results.append({
+                                add_result({
                                     "prompt": prompt_raw,
                                     "response": "Error: Empty response",
                                     "screenshot": screenshot_path,
@@ -967,12 +1020,15 @@ def scrape_chatgpt_responses(prompts):
                                 continue
 
                             screenshot_path = save_ss(sb, f"success_{i+1}")
-                            results.append({
+                            result = {
                                 "prompt": prompt_raw,
                                 "response": text,
                                 "screenshot": screenshot_path,
                                 "captcha_type": None,
-                            })
+                            }
+                            if SAVE_RESPONSE_HTML:
+                                result["response_html"] = latest
+                            add_result(result)
                             print("[SUCCESS] Response received (%d chars)\n" % len(text))
                             i += 1
                             sleep_dbg(sb, a=8, b=15, label="between prompts")
@@ -980,7 +1036,7 @@ def scrape_chatgpt_responses(prompts):
                         except Exception as e:
                             print("[ERROR] Unexpected exception -> reopen & force login:", str(e)[:200])
                             screenshot_path = save_ss(sb, f"general_exception_{i+1}")
-                            results.append({
+                            add_result({
                                 "prompt": prompt_raw,
                                 "response": f"Error: {str(e)[:150]}",
                                 "screenshot": screenshot_path,
@@ -1004,7 +1060,7 @@ def scrape_chatgpt_responses(prompts):
                 continue
 
         if i < total and tries >= max_retries:
-            results.append({
+            add_result({
                 "prompt": prompts[i],
                 "response": "Error: Could not complete prompt after retries",
                 "screenshot": None,
@@ -1012,6 +1068,16 @@ def scrape_chatgpt_responses(prompts):
             })
             i += 1
 
+    # Out of time: flush what is left so the batch still writes its output
+    while i < total:
+        add_result({
+            "prompt": prompts[i],
+            "response": "Error: Deferred before batch deadline",
+            "screenshot": None,
+            "captcha_type": None,
+        })
+        i += 1
+
     print("\n" + "=" * 80)
     print("All prompts processed!")
     print("=" * 80 + "\n")
@@ -1025,25 +1091,43 @@ def main():
     print(f"Processing {len(batch_prompts)} prompts (max {MAX_PROMPTS})")
     print("=" * 80 + "\n")
 
-    results = scrape_chatgpt_responses(batch_prompts)
+    # Keep one result per prompt; a later attempt supersedes an earlier error
+    by_offset = {}
+    for result in scrape_chatgpt_responses(batch_prompts):
+        by_offset[result.pop("prompt_offset")] = result
 
-    for idx, result in enumerate(results):
-        qi = start_idx + idx
+    results = []
+    for offset in sorted(by_offset):
+        result = by_offset[offset]
+        qi = start_idx + offset
         result["batch_id"] = batch_number
         result["query_index"] = qi
         try:
             result["prompt_id"] = data["queries"][qi].get("id", qi)
         except Exception:
             result["prompt_id"] = qi
+        results.append(result)
 
     out_file = f"results_batch_{batch_number}.json"
     with open(out_file, "w", encoding="utf-8") as f:
         json.dump(results, f, indent=2, ensure_ascii=False)
 
+    secs = METRICS["prompt_seconds"]
+    metrics_file = f"metrics_batch_{batch_number}.json"
+    with open(metrics_file, "w", encoding="utf-8") as f:
+        json.dump(dict(
+            METRICS,
+            batch_id=batch_number,
+            recycle_count=len(METRICS["recycles"]),
+            avg_prompt_seconds=round(sum(secs) / len(secs), 1) if secs else None,
+            deferred=sum(1 for r in results if r.get("response") == "Error: Deferred before batch deadline"),
+        ), f, indent=2)
+
     success = sum(1 for r in results if not str(r.get("response", "")).startswith("Error"))
     print("\n" + "=" * 80)
     print(f"[✓] Batch {batch_number}: {success}/{len(batch_prompts)} successful")
     print(f"[✓] Results saved to {out_file}")
+    print(f"[✓] Metrics saved to {metrics_file} ({len(METRICS['recycles'])} browser recycles)")
     print("=" * 80 + "\n")
     return results
 
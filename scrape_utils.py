@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Shared helpers for the scraper and the offline tools that work on its output.
+Nothing in here needs a browser, so analysis scripts can import it freely.
+"""
+
+import hashlib
+import json
+import os
+import re
+
+# ====================== Env ======================
+
+def env_int(name, default):
+    try:
+        v = os.environ.get(name, "")
+        return int(v) if str(v).strip() else default
+    except Exception:
+        return default
+
+def env_float(name, default):
+    try:
+        v = os.environ.get(name, "")
+        return float(v) if str(v).strip() else default
+    except Exception:
+        return default
+
+# ====================== Processes ======================
+
+def process_pss_kb(pid):
+    """
+    Proportional set size (kB) of one process from /proc/<pid>/smaps_rollup,
+    or None where the kernel doesn't provide it.
+    """
+    try:
+        with open(f"/proc/{pid}/smaps_rollup", "r") as f:
+            for line in f:
+                if line.startswith("Pss:"):
+                    return int(line.split()[1])
+    except Exception:
+        pass
+    return None
+
+def process_tree_memory_mb(root_pid=None):
+    """
+    Memory (MB) of every descendant of root_pid (default: this process),
+    read from /proc. The browser and driver are children of the scraper, so
+    this is the browser's footprint. Chrome's processes share most of their
+    pages, so each process counts its PSS (shared pages split between their
+    users) rather than its RSS, which would count them once per process;
+    RSS is only the fallback where smaps_rollup is missing. None where
+    /proc is missing.
+    """
+    root_pid = root_pid or os.getpid()
+    if not os.path.isdir("/proc"):
+        return None
+    parent = {}
+    rss_pages = {}
+    for name in os.listdir("/proc"):
+        if not name.isdigit():
+            continue
+        try:
+            with open(f"/proc/{name}/stat", "r") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+        except Exception:
+            continue
+        # fields[0] is state; ppid is fields[1], rss (pages) is fields[21]
+        parent[int(name)] = int(fields[1])
+        rss_pages[int(name)] = int(fields[21])
+
+    children = {}
+    for pid, ppid in parent.items():
+        children.setdefault(ppid, []).append(pid)
+    page_kb = os.sysconf("SC_PAGE_SIZE") / 1024
+    total_kb = 0
+    stack = list(children.get(root_pid, []))
+    while stack:
+        pid = stack.pop()
+        pss = process_pss_kb(pid)
+        total_kb += pss if pss is not None else rss_pages.get(pid, 0) * page_kb
+        stack.extend(children.get(pid, []))
+    return total_kb / 1024
+
+# ====================== Corpus / Results ======================
+
+def sanitize_prompt(p):
+    """
+    Normalize a raw prompt string, strip any leading 'prompt'/'delete'/'query' prefix,
+    even if FUSED DIRECTLY to next text (e.g., 'DeleteAs...' -> 'As...').
+    Remains otherwise unchanged.
+    """
+    if p is None:
+        return ""
+
+    s = str(p).replace("\u200b", "")
+    s = s.replace("[", "").replace("]", "").strip()
+
+    # Remove any number of leading occurrences (fused or spaced) at the start
+    before = None
+    pattern = re.compile(r'^(?:prompt|delete|query)+', flags=re.I)
+    while s != before:
+        before = s
+        s = pattern.sub("", s).strip()
+
+    # Remove any number of control words with separators (space, colon, dash)
+    separator_pattern = re.compile(r'^\s*((?:prompt|delete|query)\s*[:\-]?\s*)+', flags=re.I)
+    while s != before:
+        before = s
+        s = separator_pattern.sub("", s, count=1).strip()
+
+    # Normalize spaces
+    s = re.sub(r'\s+', ' ', s).strip()
+    return s
+
+def load_json(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def load_query_index(path="merlinAi.json"):
+    """
+    Map query id -> query dict from the prompt corpus.
+    Returns an empty dict if the corpus file is missing.
+    """
+    if not os.path.exists(path):
+        print(f"[WARN] Corpus file not found: {path}")
+        return {}
+    data = load_json(path)
+    return {q.get("id"): q for q in data.get("queries", []) if q.get("id")}
+
+def is_error_response(result):
+    return str(result.get("response", "")).startswith("Error")
+
+ERROR_STATUSES = {
+    "Error: Empty prompt after cleaning": "empty_prompt",
+    "Error: Send failed": "send_failed",
+    "Error: No response": "no_response",
+    "Error: Extract failed": "extract_failed",
+    "Error: Empty response": "empty_response",
+    "Error: Could not complete prompt after retries": "retries_exhausted",
+    "Error: Deferred before batch deadline": "deferred",
+}
+
+def result_status(result):
+    """
+    Short status slug for a result: "ok", one of ERROR_STATUSES, or
+    "exception" for the free-form "Error: <exception>" responses.
+    """
+    if not is_error_response(result):
+        return "ok"
+    return ERROR_STATUSES.get(str(result.get("response", "")).strip(), "exception")
+
+def result_query(result, query_index):
+    """
+    Corpus entry (type, persona, ...) for a result, looked up by prompt_id.
+    """
+    return query_index.get(result.get("prompt_id")) or {}
+
+def iter_json_array(path, chunk_size=1 << 16):
+    """
+    Yield the elements of a top-level JSON array one at a time, reading the
+    file in chunks instead of json.load()-ing the whole thing.
+    """
+    decoder = json.JSONDecoder()
+    with open(path, "r", encoding="utf-8") as f:
+        buf = ""
+        started = False
+        eof = False
+        while True:
+            if not eof:
+                data = f.read(chunk_size)
+                eof = not data
+                buf += data
+            pos = 0
+            n = len(buf)
+            while True:
+                while pos < n and buf[pos] in " \t\r\n,":
+                    pos += 1
+                if pos >= n:
+                    break
+                if not started:
+                    if buf[pos] != "[":
+                        raise ValueError(f"{path}: expected a JSON array")
+                    started = True
+                    pos += 1
+                    continue
+                if buf[pos] == "]":
+                    return
+                try:
+                    obj, end = decoder.raw_decode(buf, pos)
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                    break
+                # A number cut off by the chunk boundary ("123" of "12345", "2.5"
+                # of "2.5e10") still decodes; until the file is done, only trust a
+                # value that is followed by a separator
+                if not eof and (end >= n or buf[end] not in " \t\r\n,]"):
+                    break
+                pos = end
+                yield obj
+            buf = buf[pos:]
+            if eof and not buf.strip():
+                if not started:
+                    return
+                raise ValueError(f"{path}: unterminated JSON array")
+
+# ====================== Extraction ======================
+
+# Tried in order; the last match on the page is the latest assistant message
+RESPONSE_SELECTORS = [
+    '[data-message-author-role="assistant"] .markdown',
+    '[data-message-author-role="assistant"] article',
+    'div[data-message-author-role="assistant"]',
+    '[class*="message"] [class*="markdown"]',
+    '[role="article"] .markdown',
+]
+
+def extract_response_text(message_html):
+    """
+    Plain text of one assistant message's HTML, as stored in results.
+    """
+    from bs4 import BeautifulSoup
+    return BeautifulSoup(message_html, "html.parser").text.strip().replace("\n\n\n", "\n\n")
+
+def select_latest_response(page_html):
+    """
+    Browser-free equivalent of the scraper's selector walk over a saved page:
+    HTML of the last element matched by the first RESPONSE_SELECTORS entry
+    that matches anything, or None.
+    """
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(page_html, "html.parser")
+    for sel in RESPONSE_SELECTORS:
+        elems = soup.select(sel)
+        if elems:
+            return str(elems[-1])
+    return None
+
+# ====================== Text / Signatures ======================
+
+def normalize_text(text):
+    """
+    Canonical plain text for a stored response: drops zero-width and
+    non-breaking spaces, collapses runs of spaces and blank lines. The stored
+    "response" is already BeautifulSoup text, so "<", ">" and "&amp;" in it are
+    literal answer text and are kept as is; HTML goes through
+    extract_response_text instead.
+    """
+    s = str(text or "")
+    s = s.replace("\u200b", "").replace("\xa0", " ")
+    s = re.sub(r"[ \t\f\v]+", " ", s)
+    s = re.sub(r" *\n *", "\n", s)
+    s = re.sub(r"\n{3,}", "\n\n", s)
+    return s.strip()
+
+def text_signature(text):
+    """
+    Stable content hash of a response, insensitive to case and whitespace.
+    """
+    s = re.sub(r"\s+", " ", normalize_text(text)).lower()
+    return hashlib.sha1(s.encode("utf-8")).hexdigest()
+
+# ====================== Brand Mentions ======================
+
+TRACKED_BRANDS = {
+    "Merlin AI": [r"merlin\s*ai", r"merlinai\.co"],
+    "Procore": [r"procore"],
+    "Autodesk Construction Cloud": [r"autodesk\s+construction\s+cloud", r"autodesk\s+build", r"bim\s*360"],
+    "Buildertrend": [r"buildertrend"],
+    "Fieldwire": [r"fieldwire"],
+    "PlanGrid": [r"plangrid"],
+    "Oracle Aconex": [r"aconex"],
+    "Oracle Primavera": [r"primavera(?:\s+p6)?"],
+    "CoConstruct": [r"coconstruct"],
+    "Trimble Viewpoint": [r"trimble\s+viewpoint", r"viewpoint\s+vista"],
+    "Microsoft Project": [r"microsoft\s+project", r"ms\s+project"],
+}
+
+def tracked_brands():
+    """
+    TRACKED_BRANDS, or a comma-separated override from the env var of the
+    same name (each name is matched literally).
+    """
+    raw = os.environ.get("TRACKED_BRANDS", "").strip()
+    if not raw:
+        return TRACKED_BRANDS
+    names = [b.strip() for b in raw.split(",") if b.strip()]
+    return {b: [re.escape(b).replace(r"\ ", r"\s+")] for b in names}
+
+def compile_brand_pattern(brands=None):
+    """
+    One alternation regex over every alias; the matching group name tells
+    which brand hit, so a text is scanned once for all brands.
+    Returns (pattern, group name -> brand name).
+    """
+    brands = brands or tracked_brands()
+    groups = {}
+    parts = []
+    for i, (name, aliases) in enumerate(brands.items()):
+        g = f"b{i}"
+        groups[g] = name
+        parts.append(f"(?P<{g}>{'|'.join(aliases)})")
+    return re.compile(r"\b(?:%s)\b" % "|".join(parts), re.I), groups
+
+def find_mentions(text, pattern, groups):
+    """
+    Brand -> mention count for text.
+    """
+    found = {}
+    for m in pattern.finditer(text or ""):
+        name = groups[m.lastgroup]
+        found[name] = found.get(name, 0) + 1
+    return found
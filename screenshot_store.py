@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Content-addressed screenshot store.
+
+The scraper still hands out paths like screenshots/b3_login_page_1700000000.png
+(that is what goes into each result's "screenshot" field), but the image itself
+is moved to screenshots/blobs/<sha[:2]>/<sha256>.png and index.json maps the
+path to its blob. Identical captures are stored once.
+
+With SCREENSHOT_PHASH_DISTANCE > 0 and Pillow installed, a 64-bit difference
+hash is also kept per blob and a new image within that Hamming distance of an
+existing blob is mapped to it instead of being stored.
+
+Run as a script to merge several stores (one per batch artifact) into one:
+    STORE_SOURCES   glob of store directories (default batch-screenshots/*)
+    STORE_DEST      merged store (default screenshots)
+"""
+
+import glob
+import hashlib
+import json
+import os
+import shutil
+
+from scrape_utils import env_int
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+INDEX_NAME = "index.json"
+PHASH_DISTANCE = env_int("SCREENSHOT_PHASH_DISTANCE", 0)
+
+# ====================== Index ======================
+
+def load_index(store_dir):
+    path = os.path.join(store_dir, INDEX_NAME)
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return {"blobs": {}, "files": {}}
+
+def save_index(store_dir, index):
+    path = os.path.join(store_dir, INDEX_NAME)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(index, f, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+def blob_path(store_dir, sha, ext=".png"):
+    return os.path.join(store_dir, "blobs", sha[:2], sha + ext)
+
+def resolve_screenshot(store_dir, path, index=None):
+    """
+    Blob file for a result's "screenshot" value, or None if unknown.
+    """
+    index = index or load_index(store_dir)
+    sha = index["files"].get(path)
+    if not sha:
+        return None
+    return blob_path(store_dir, sha, index["blobs"][sha].get("ext", ".png"))
+
+# ====================== Hashing ======================
+
+def file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 16), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def dhash(path):
+    """
+    64-bit difference hash as hex, or None without Pillow / on decode errors.
+    """
+    if Image is None:
+        return None
+    try:
+        with Image.open(path) as im:
+            px = list(im.convert("L").resize((9, 8)).getdata())
+    except Exception:
+        return None
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            bits = (bits << 1) | (px[row * 9 + col] > px[row * 9 + col + 1])
+    return "%016x" % bits
+
+def find_near_duplicate(index, phash, max_distance):
+    if not phash or max_distance <= 0:
+        return None
+    target = int(phash, 16)
+    for sha, meta in index["blobs"].items():
+        other = meta.get("phash")
+        if other and bin(target ^ int(other, 16)).count("1") <= max_distance:
+            return sha
+    return None
+
+# ====================== Store ======================
+
+def add_blob(store_dir, index, src_path, phash_distance=PHASH_DISTANCE):
+    """
+    Copy src_path into the store unless its content (or, with phash, a near
+    duplicate) is already there. Returns the blob sha it maps to.
+    """
+    sha = file_sha256(src_path)
+    if sha in index["blobs"]:
+        return sha
+    ext = os.path.splitext(src_path)[1] or ".png"
+    phash = dhash(src_path) if phash_distance > 0 else None
+    near = find_near_duplicate(index, phash, phash_distance)
+    if near:
+        return near
+    dest = blob_path(store_dir, sha, ext)
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    shutil.copyfile(src_path, dest)
+    index["blobs"][sha] = {"ext": ext, "size": os.path.getsize(dest), "phash": phash}
+    return sha
+
+def store_screenshot(path, store_dir="screenshots"):
+    """
+    Move a freshly saved screenshot into the store and index it under path.
+    """
+    index = load_index(store_dir)
+    sha = add_blob(store_dir, index, path)
+    index["files"][path] = sha
+    save_index(store_dir, index)
+    os.remove(path)
+    return sha
+
+def merge_stores(src_dirs, dest_dir):
+    """
+    Merge per-batch stores into dest_dir; each distinct image is copied once.
+    """
+    os.makedirs(dest_dir, exist_ok=True)
+    dest = load_index(dest_dir)
+    copied = 0
+    for src_dir in src_dirs:
+        src = load_index(src_dir)
+        remap = {}
+        for sha, meta in src["blobs"].items():
+            before = len(dest["blobs"])
+            remap[sha] = add_blob(dest_dir, dest, blob_path(src_dir, sha, meta.get("ext", ".png")))
+            copied += len(dest["blobs"]) - before
+        for path, sha in src["files"].items():
+            if sha in remap:
+                dest["files"][path] = remap[sha]
+        print(f"[SCREENSHOTS] {src_dir}: {len(src['files'])} screenshots, {len(src['blobs'])} blobs")
+    save_index(dest_dir, dest)
+    return copied, dest
+
+# ====================== Entry ======================
+
+def main():
+    sources = sorted(d for d in glob.glob(os.environ.get("STORE_SOURCES", "batch-screenshots/*")) if os.path.isdir(d))
+    dest_dir = os.environ.get("STORE_DEST", "screenshots")
+    copied, index = merge_stores(sources, dest_dir)
+    total = sum(m["size"] for m in index["blobs"].values())
+    print(f"[✓] {len(index['files'])} screenshots from {len(sources)} stores -> "
+          f"{len(index['blobs'])} blobs ({copied} new, {total / 1024:.0f} KB) in {dest_dir}")
+    return index
+
+if __name__ == "__main__":
+    main()